@@ -1,24 +1,135 @@
+import asyncio
+import atexit
+import copy
+import functools
+import json
+import os
+import re
 import uuid
+from collections import OrderedDict
 from textwrap import dedent
 
+import groq
 import pymongo
 import yaml
-from contextlib import contextmanager
 from sshtunnel import SSHTunnelForwarder
 from core.agent import Agent
 from core.tools import google_search_api, map_search_api
 
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+try:
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader
+
+_YAML_CACHE = OrderedDict()  # abs path -> (mtime, size, parsed dict)
+_YAML_CACHE_MAX = 100
+
+# Planning is the most expensive call to lose, so its client retries a little harder.
+_PLANNING_MAX_RETRIES = 3
+
+# Context longer than this is replaced by a digest that aims for _CONTEXT_SUMMARY_MAX chars.
+_CONTEXT_SUMMARY_THRESHOLD = 4000
+_CONTEXT_SUMMARY_MAX = 1500
+
+# Acknowledgements that carry no new preference signal. "yes"/"no" are left out
+# on purpose: as answers to a question they do carry information.
+_TRIVIAL_ANSWERS = frozenset({"", "ok", "okay", "k", "sure", "fine", "thanks", "thank you", "cool"})
+
+# (pattern showing a slot is covered, question asking for it), in asking order.
+# Whole words only, so e.g. "today" doesn't count as a date or "capacity" as a city.
+_SLOT_QUESTIONS = tuple((re.compile(pattern), question) for pattern, question in (
+    (r"\b(?:destinations?|city|cities|country|countries|beach(?:es)?|mountains?)\b",
+     "Where would you like to travel"),
+    (r"\b(?:dates?|months?|weeks?|seasons?|days?)\b",
+     "When are you planning to travel and for how long"),
+    (r"\$|\b(?:budget|usd|costs?|prices?)\b",
+     "What budget do you have in mind for this trip"),
+    (r"\b(?:solo|alone|family|friends|partner|group|couple)\b",
+     "Who will you be traveling with"),
+    (r"\b(?:activity|activities|interests?|food|culture|adventure|relax(?:ing|ation)?)\b",
+     "What kind of activities do you enjoy while traveling"),
+))
+
+
+def _has_only_str_keys(data):
+    """Tells whether every mapping in ``data`` has string keys, i.e. JSON keeps it as is."""
+    if isinstance(data, dict):
+        return all(isinstance(k, str) and _has_only_str_keys(v) for k, v in data.items())
+    if isinstance(data, list):
+        return all(_has_only_str_keys(v) for v in data)
+    return True
+
+
+def _parse_config_file(path, stat):
+    """Parses a YAML file, going through its ``.json`` sidecar when it matches ``stat``."""
+    sidecar = path + '.json'
+    source = [stat.st_mtime_ns, stat.st_size]
+    try:
+        with open(sidecar, 'r', encoding='utf-8') as file:
+            cached = json.load(file)
+        if cached.get('source') == source:
+            return cached['data']
+    except (OSError, ValueError, AttributeError, KeyError):
+        pass
+
+    with open(path, 'r', encoding='utf-8') as file:
+        data = yaml.load(file, Loader=_SafeLoader) or {}
+
+    if not _has_only_str_keys(data):
+        # JSON would turn non-string keys into strings and change the config on the next load.
+        return data
+
+    tmp_path = f"{sidecar}.{os.getpid()}.tmp"
+    try:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        # The sidecar holds the same secrets as the source, so it gets the same permissions.
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, stat.st_mode & 0o777)
+        with open(fd, 'w', encoding='utf-8') as file:
+            json.dump({'source': source, 'data': data}, file)
+        os.replace(tmp_path, sidecar)
+    except (OSError, TypeError, ValueError):
+        # Read-only deployments or values JSON can't represent: keep the YAML result.
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+    return data
+
 
 class Config:
     def __init__(self, file_path="config.yaml"):
         self.file_path = file_path
         self.config_data = self._load_config()
+        self._flat = dict(self._walk(self.config_data))
 
     def _load_config(self):
-        """Loads the configuration file and returns it as a dictionary."""
+        """Loads the configuration file and returns it as a dictionary.
+
+        Parsed files are cached per absolute path and revalidated against
+        the file's mtime and size, so repeated loads skip the YAML parser.
+        """
+        path = os.path.abspath(self.file_path)
         try:
-            with open(self.file_path, 'r', encoding='utf-8') as file:
-                return yaml.safe_load(file) or {}
+            stat = os.stat(path)
+            cached = _YAML_CACHE.get(path)
+            if cached is not None and cached[:2] == (stat.st_mtime, stat.st_size):
+                _YAML_CACHE.move_to_end(path)
+                return copy.deepcopy(cached[2])
+
+            data = _parse_config_file(path, stat)
+            _YAML_CACHE[path] = (stat.st_mtime, stat.st_size, data)
+            _YAML_CACHE.move_to_end(path)
+            if len(_YAML_CACHE) > _YAML_CACHE_MAX:
+                _YAML_CACHE.popitem(last=False)
+            return copy.deepcopy(data)
         except FileNotFoundError:
             print(f"Config file '{self.file_path}' not found. Starting with an empty config.")
             return {}
@@ -26,80 +137,354 @@ class Config:
             print(f"Error parsing YAML file: {e}")
             return {}
 
+    @classmethod
+    def _walk(cls, data, prefix=''):
+        """Yields (dotted path, value) for every nested key, including intermediate mappings."""
+        if not isinstance(data, dict):
+            return
+        for k, v in data.items():
+            if not isinstance(k, str) or '.' in k:
+                continue
+            path = prefix + k
+            yield path, v
+            if isinstance(v, dict):
+                yield from cls._walk(v, path + '.')
+
     def __getitem__(self, key, default=None):
         """Gets a configuration value using dot notation for nested keys."""
-        keys = key.split('.')
-        value = self.config_data
-        for k in keys:
-            if isinstance(value, dict) and k in value:
-                value = value[k]
-            else:
-                return default
-        return value
+        return self._flat.get(key, default)
 
 
 class MongoDBHandler:
+    _ssh_tunnels = {}  # (ssh host, ssh port, ssh user, remote host, remote port) -> tunnel
+
     def __init__(self, config):
-        config = Config(config)
-        self.mongodb_config = config['mongodb']
-        self.ssh_config = config['ssh']
-        self.use_ssh = config['mongodb.use_ssh']
-        self.connection_string = None
-        self.ssh_tunnel = None
-        self.client = None
-
-    @contextmanager
-    def connect(self):
-        ssh_config = self.ssh_config
+        """Accepts either a config file path or an already loaded ``Config``."""
+        self._cfg = config if isinstance(config, Config) else Config(config)
+        self.mongodb_config = self._cfg['mongodb']
+        self.ssh_config = self._cfg['ssh']
+        # Dot notation walks the nested mapping, i.e. mongodb -> use_ssh.
+        self.use_ssh = self._cfg['mongodb.use_ssh']
+
         mongodb_config = self.mongodb_config
 
-        if self.use_ssh and self.ssh_tunnel:
-            self.ssh_tunnel = SSHTunnelForwarder(
-                ssh_address_or_host=(ssh_config['host'], ssh_config['port']),
-                ssh_username=ssh_config['username'],
-                ssh_password=ssh_config['password'],
-                remote_bind_address=(mongodb_config['host'], mongodb_config['port'])
-            )
+        if self.use_ssh:
             host = "127.0.0.1"
-            port = self.ssh_tunnel.local_bind_port
+            port = self._get_ssh_tunnel().local_bind_port
         else:
             host = mongodb_config['host']
             port = mongodb_config['port']
 
-        try:
-            if self.use_ssh:
-                self.ssh_tunnel.start()
-            self.client = pymongo.MongoClient(
-                host=host,
-                port=port,
-                username=mongodb_config['username'],
-                password=mongodb_config['password'],
+        self.client = pymongo.MongoClient(
+            host=host,
+            port=port,
+            username=mongodb_config['username'],
+            password=mongodb_config['password'],
+            maxPoolSize=50,
+            minPoolSize=5,
+        )
+        self.connection_string = f"mongodb://{mongodb_config['username']}:{mongodb_config['password']}@{host}:{port}/"
+        atexit.register(self.client.close)
+
+    def _get_ssh_tunnel(self):
+        """Starts the shared SSH tunnel for this config's endpoints on first use and returns it."""
+        ssh_config = self.ssh_config
+        mongodb_config = self.mongodb_config
+        key = (ssh_config['host'], ssh_config['port'], ssh_config['username'],
+               mongodb_config['host'], mongodb_config['port'])
+        tunnel = MongoDBHandler._ssh_tunnels.get(key)
+        if tunnel is None:
+            tunnel = SSHTunnelForwarder(
+                ssh_address_or_host=(ssh_config['host'], ssh_config['port']),
+                ssh_username=ssh_config['username'],
+                ssh_password=ssh_config['password'],
+                remote_bind_address=(mongodb_config['host'], mongodb_config['port'])
             )
-            self.connection_string = f"mongodb://{mongodb_config['username']}:{mongodb_config['password']}@{host}:{port}/"
-            yield self.client[mongodb_config['database']]
-        finally:
-            if self.use_ssh:
-                self.ssh_tunnel.stop()
-            self.client.close()
+            tunnel.start()
+            atexit.register(tunnel.stop)
+            MongoDBHandler._ssh_tunnels[key] = tunnel
+        return tunnel
+
+    @property
+    def db(self):
+        return self.client[self.mongodb_config['database']]
+
+
+@functools.lru_cache(maxsize=None)
+def get_mongodb_handler(config="config.yaml"):
+    """Returns the process-wide MongoDBHandler for a config path or ``Config``, so its client pool is shared."""
+    return MongoDBHandler(config)
 
 
 class Session:
     def __init__(self, session_id: int = None):
         self.session_id = session_id if session_id is not None else str(uuid.uuid4())
-        self.db = MongoDBHandler("config.yaml")
-        with self.db.connect() as db:
-            if session_id is not None:
-                self.session = next(db.sessions.find({"session_id": self.session_id}))
-            else:
-                self.session = {"session_id": self.session_id, "context": [], "options": [], "plan": None}
-                db.sessions.insert_one(self.session)
+        self.db = get_mongodb_handler("config.yaml")
+        db = self.db.db
+        if session_id is not None:
+            self.session = next(db.sessions.find({"session_id": self.session_id}))
+        else:
+            self.session = {"session_id": self.session_id, "context": [], "options": [], "plan": None}
+            db.sessions.insert_one(self.session)
 
     def update(self):
-        with self.db.connect() as db:
-            self.session = db.sessions.update_one({"session_id": self.session_id})
+        db = self.db.db
+        db.sessions.update_one(
+            {"session_id": self.session_id},
+            {"$set": {"context": self["context"], "options": self["options"], "plan": self["plan"]}}
+        )
 
     def __getitem__(self, item):
-        self.session.get(item)
+        return self.session.get(item)
+
+    def __setitem__(self, item, value):
+        self.session[item] = value
+
+
+_CONTEXT_PROMPT_TMPL = dedent("""
+    TASK:
+    Convert user queries into rich context summaries and intelligent follow-up questions.
+
+    INPUT:
+    {{
+        "agent_question": {question},
+        "user_answer: {answer},
+        "previous_context": {context},
+    }}
+
+    OUTPUT:
+    {{
+        "user_context": "Rich descriptive text about user preferences and profile",
+        "following_question": "Natural follow-up question for missing information"
+    }}
+
+    PROCESS:
+    1. Preference Analysis
+    - Explicit Preferences:
+    * Directly stated destinations
+    * Budget mentions
+    * Timeline requirements
+    * Activity requests
+
+    - Implicit Preferences:
+    * Travel style hints
+    * Comfort level indicators
+    * Cultural interest signals
+    * Risk tolerance cues
+
+    - Personal Context:
+    * Group composition
+    * Age indicators
+    * Physical capabilities
+    * Cultural background
+    * Travel experience level        
+
+    2. Context Synthesis
+    - Combine all identified preferences
+    - Map relationships between preferences
+    - Factor in seasonal considerations
+    - Consider destination-specific context
+    - Analyze budget implications
+    - Evaluate logistical requirements
+
+    3. Follow-up Question Generation
+    - Identify critical information gaps
+    - Prioritize questions by impact
+    - Use warm, conversational tone
+    - Include relevant examples
+    - Consider destination-specific factors
+
+    Response Guidelines
+
+    Always acknowledge and build upon previous context
+    Use travel industry expertise to make informed assumptions
+    Balance between gathering information and maintaining conversation flow
+    Adapt tone based on user's communication style
+    Provide subtle education about destinations when relevant        
+
+    EXAMPLES:
+    Query: "Looking for a beach vacation in Asia this December"
+    Output:
+    {{
+        "user_context": "The traveler is seeking a warm beach destination in Asia during December's winter season. They have an international travel preference with timing that aligns with peak season in many Asian beach destinations. The interest in beaches suggests a desire for relaxation and possibly water activities.",
+        "following_question": "What's your ideal trip length and are you interested more in secluded beaches like those in Thailand's islands, or lively beaches with nearby city attractions like Bali?"
+    }}
+""")
+
+
+_SUMMARY_PROMPT_TMPL = dedent("""
+    TASK:
+    Compress the traveler context below into a digest of at most {max_chars} characters.
+
+    RULES:
+    - Keep every concrete fact: destinations, dates, budget, group composition, constraints
+    - Keep stated and implied preferences, dropping repetition and filler
+    - Write plain descriptive text, no lists or JSON
+
+    CONTEXT:
+    {context}
+""")
+
+
+_RECOMMENDATION_PROMPT_TMPL = dedent("""
+    TASK:
+    Follow this specific order when making recommendations:
+
+    1. Destination Options
+    2. Travel Dates                
+    3. Accommodation Options
+    4. Transportation Options
+
+    INPUT:
+    User Context: {context}
+
+    Operating Rules
+
+    1. Sequence Following
+    - Always follow the recommendation order based on the specified context for specify more details(Destination → Dates → Accommodation → Transportation → Activities -> Dining)
+    - Wait for user selection before proceeding to next step
+
+    2. Recommendation Generation
+    - Always provide 5-7 options for each category
+    - Include at least one premium and one budget option
+    - Sort by match score descending
+    - Explain why each option matches user preferences
+
+    3. Context Consideration
+    - Reference previous selections when making new recommendations
+    - Consider group composition for all suggestions
+    - Factor in stated budget constraints
+    - Account for seasonal factors
+
+    Output Example:
+    {{
+        "message": "Great choice! For Bali in December, here are the best dates considering weather and your preferences:",
+        "date_options": [...]
+    }}
+""")
+
+
+_PLANNING_PROMPT_TMPL = dedent("""
+    You are a Travel Itinerary Planner that creates comprehensive, day-by-day travel plans by organizing all selected options into a structured, detailed itinerary. You take all selected destinations, accommodations, activities, transportation, and dining choices and transform them into a cohesive daily plan with all necessary details and logistics.
+
+    INPUT STRUCTURE:
+    The input will be a JSON object containing:
+    {{
+        "selected_options": {options},
+        "user_context": "{context}"
+    }}
+
+    REQUIRED OUTPUT STRUCTURE:
+    You must provide a JSON response in this exact format:
+    {{
+        "final_plan": {{
+            "plan_summary": {{
+                "title": "Descriptive trip title",
+                "traveler_info": {{
+                    "group_size": "Number and type of travelers",
+                    "travel_dates": "Full date range",
+                    "budget_category": "Budget level"
+                }},
+                "overview": "Brief trip description",
+                "highlights": ["Key experiences", "Special moments", "Unique opportunities"],
+                "total_budget": {{
+                    "amount": "Total in USD",
+                    "breakdown": {{
+                        "accommodation": "Amount",
+                        "activities": "Amount",
+                        "transportation": "Amount",
+                        "food": "Amount",
+                        "miscellaneous": "Amount"
+                    }}
+                }}
+            }},
+            "essential_information": {{
+                "weather_forecast": "General weather info",
+                "required_documents": ["Necessary documents", "Visas", "Passes"],
+                "important_notes": ["Practical tips", "Local customs", "Essential apps"],
+                "health_safety": ["Local emergency numbers", "List of facilities", "Location-specific advice"]
+                "packing_recommendations": ["Weather-appropriate items", "Activity-specific gear"]
+            }},
+            "daily_itinerary": [
+                {{
+                    "day": "Day number",
+                    "date": "Specific date",
+                    "weather_forecast": "Range in C/F Expected weather",
+                    "activities": [
+                        {{
+                            "time": "Start time",
+                            "activity": "Name of activity",
+                            "duration": "Length in minutes/hours",
+                            "location": {{
+                                "name": "Place name",
+                                "address": "Full address",
+                                "coordinates": "GPS coordinates",
+                                "map_link": "URL"
+                            }},
+                            "transport": {{
+                                "mode": "Type of transport",
+                                "duration": "Travel time",
+                                "cost": "Amount",
+                                "notes": "Special instructions"
+                            }},
+                            "booking_reference": "If applicable",
+                            "budget": {{
+                                "amount": "Cost in local currency and USD",
+                                "included_items": ["What's covered"],
+                                "additional_costs": ["Optional extras"]
+                            }},
+                            "tips": ["Relevant advice", "Best photo spots", "What to bring"]
+                        }}
+                    ],
+                    "daily_notes": ["Day-specific tips", "Timing considerations", "Backup plans"]
+                }}
+            ],
+            "contingency_plans": {{
+                "weather_alternatives": ["Indoor options"],
+                "backup_activities": ["Secondary choices"],
+                "flexible_timing": ["Adjustable components"]
+            }}
+        }}
+    }}
+
+    PLANNING RULES:
+
+    1. Organization:
+    - Create logical day-by-day flow
+    - Balance activity levels
+    - Account for travel times between locations
+    - Include meal times and rest periods
+    - Ensure activities are properly spaced
+
+    2. Time Management:
+    - Add 30-minute buffers between activities
+    - Consider check-in/check-out times
+    - Check venue operating hours
+    - Plan around sunrise/sunset times
+    - Account for peak tourist times
+
+    3. Budget Tracking:
+    - Include all costs in local currency and USD
+    - Track running total against overall budget
+    - Note included vs additional costs
+    - Add booking references where applicable
+
+    4. Practical Details:
+    - Check weather impact on activities
+    - Include all booking requirements
+    - Add transportation logistics
+    - Provide local tips and cultural notes
+    - Include emergency information
+
+    5. Documentation:
+    - Start with clear summary
+    - List essential information first
+    - Create detailed daily schedules
+    - Include backup plans
+    - Add relevant maps and coordinates
+
+    Remember to maintain a balance between activities and rest, consider local customs and timing, and ensure all practical details are included for each activity.
+""")
 
 
 class Advisor:
@@ -189,281 +574,123 @@ class Advisor:
             transportation, and dining choices and transform them into a
             cohesive daily plan with all necessary details and logistics.
             """),
-            tools=[self.tools["google_search_api"]]
+            tools=[self.tools["google_search_api"]],
+            max_retries=_PLANNING_MAX_RETRIES
+        )
+        self.summarizer_agent = Agent(
+            role="Travel Context Summarizer",
+            goal="Condense long traveler context profiles without losing any preference or constraint",
+            backstory=dedent("""
+            You keep the travel planning system's context compact.
+            Other agents read your digests instead of the full conversation history,
+            so every fact they need must survive the compression.
+            """)
         )
         self.context = self.session["context"]
         self.options = self.session["options"]
-
-    def context_analyze(self, answer: str, question: str) -> dict:
-
-        output = self.context_analyzer_agent.task(
-            description=dedent(f"""
-            TASK:
-            Convert user queries into rich context summaries and intelligent follow-up questions.
-            
-            INPUT:
-            {{
-                "agent_question": {question},
-                "user_answer: {answer},
-                "previous_context": {self.context},
-            }}
-            
-            OUTPUT:
-            {{
-                "user_context": "Rich descriptive text about user preferences and profile",
-                "following_question": "Natural follow-up question for missing information"
-            }}
-            
-            PROCESS:
-            1. Preference Analysis
-            - Explicit Preferences:
-            * Directly stated destinations
-            * Budget mentions
-            * Timeline requirements
-            * Activity requests
-            
-            - Implicit Preferences:
-            * Travel style hints
-            * Comfort level indicators
-            * Cultural interest signals
-            * Risk tolerance cues
-        
-            - Personal Context:
-            * Group composition
-            * Age indicators
-            * Physical capabilities
-            * Cultural background
-            * Travel experience level        
-            
-            2. Context Synthesis
-            - Combine all identified preferences
-            - Map relationships between preferences
-            - Factor in seasonal considerations
-            - Consider destination-specific context
-            - Analyze budget implications
-            - Evaluate logistical requirements
-            
-            3. Follow-up Question Generation
-            - Identify critical information gaps
-            - Prioritize questions by impact
-            - Use warm, conversational tone
-            - Include relevant examples
-            - Consider destination-specific factors
-            
-            Response Guidelines
-            
-            Always acknowledge and build upon previous context
-            Use travel industry expertise to make informed assumptions
-            Balance between gathering information and maintaining conversation flow
-            Adapt tone based on user's communication style
-            Provide subtle education about destinations when relevant        
-            
-            EXAMPLES:
-            Query: "Looking for a beach vacation in Asia this December"
-            Output:
-            {{
-                "user_context": "The traveler is seeking a warm beach destination in Asia during December's winter season. They have an international travel preference with timing that aligns with peak season in many Asian beach destinations. The interest in beaches suggests a desire for relaxation and possibly water activities.",
-                "following_question": "What's your ideal trip length and are you interested more in secluded beaches like those in Thailand's islands, or lively beaches with nearby city attractions like Bali?"
-            }}
-        """),
+        self._recommendation = None
+        self._recommendation_context = None
+
+    def _next_slot_question(self, question: str) -> str:
+        """Asks for the first slot the context doesn't mention yet, else repeats the last question."""
+        context = str(self.context or "").lower()
+        for pattern, slot_question in _SLOT_QUESTIONS:
+            if not pattern.search(context):
+                return slot_question
+        return question
+
+    async def context_analyze(self, answer: str, question: str) -> dict:
+        if answer.strip().strip(".!").lower() in _TRIVIAL_ANSWERS:
+            # Nothing to analyze: keep the context and skip the LLM round-trip.
+            return {"user_context": self.context, "following_question": self._next_slot_question(question)}
+
+        output = await self.context_analyzer_agent.task(
+            description=_CONTEXT_PROMPT_TMPL.format(question=question, answer=answer, context=self.context),
             json_output=True
         )
 
         self.context = output["user_context"]
+        if len(str(self.context)) > _CONTEXT_SUMMARY_THRESHOLD:
+            self.context = await self._summarize_context()
 
         return output
 
-    def recommendation(self) -> dict:
-        output = self.recommender_agent.task(
-            description=dedent(f"""
-            TASK:
-            Follow this specific order when making recommendations:
-            
-            1. Destination Options
-            2. Travel Dates                
-            3. Accommodation Options
-            4. Transportation Options
-            
-            INPUT:
-            User Context: {self.context}
-            
-            Operating Rules
-            
-            1. Sequence Following
-            - Always follow the recommendation order based on the specified context for specify more details(Destination → Dates → Accommodation → Transportation → Activities -> Dining)
-            - Wait for user selection before proceeding to next step
-            
-            2. Recommendation Generation
-            - Always provide 5-7 options for each category
-            - Include at least one premium and one budget option
-            - Sort by match score descending
-            - Explain why each option matches user preferences
-            
-            3. Context Consideration
-            - Reference previous selections when making new recommendations
-            - Consider group composition for all suggestions
-            - Factor in stated budget constraints
-            - Account for seasonal factors
-            
-            Output Example:
-            {{
-                "message": "Great choice! For Bali in December, here are the best dates considering weather and your preferences:",
-                "date_options": [...]
-            }}
-        """),
+    async def _summarize_context(self) -> str:
+        """Returns a short digest of the context, or the context itself if summarizing fails or doesn't shrink it."""
+        try:
+            summary = await self.summarizer_agent.task(
+                description=_SUMMARY_PROMPT_TMPL.format(max_chars=_CONTEXT_SUMMARY_MAX, context=self.context)
+            )
+        except groq.GroqError as e:
+            print(f"Context summary failed: {e!r}")
+            return self.context
+        # An overlong digest is still accepted below the threshold; cutting it would drop facts.
+        if not summary or len(summary) > _CONTEXT_SUMMARY_THRESHOLD:
+            return self.context
+        return summary
+
+    async def recommendation(self) -> dict:
+        output = await self.recommender_agent.task(
+            description=_RECOMMENDATION_PROMPT_TMPL.format(context=self.context),
             json_output=True
         )
 
         return output
 
-    def planning(self) -> dict:
-        output = self.planner_agent.task(
-            description=dedent(f"""
-            You are a Travel Itinerary Planner that creates comprehensive, day-by-day travel plans by organizing all selected options into a structured, detailed itinerary. You take all selected destinations, accommodations, activities, transportation, and dining choices and transform them into a cohesive daily plan with all necessary details and logistics.
-            
-            INPUT STRUCTURE:
-            The input will be a JSON object containing:
-            {{
-                "selected_options": {self.options},
-                "user_context": "{self.context}"
-            }}
-            
-            REQUIRED OUTPUT STRUCTURE:
-            You must provide a JSON response in this exact format:
-            {{
-                "final_plan": {{
-                    "plan_summary": {{
-                        "title": "Descriptive trip title",
-                        "traveler_info": {{
-                            "group_size": "Number and type of travelers",
-                            "travel_dates": "Full date range",
-                            "budget_category": "Budget level"
-                        }},
-                        "overview": "Brief trip description",
-                        "highlights": ["Key experiences", "Special moments", "Unique opportunities"],
-                        "total_budget": {{
-                            "amount": "Total in USD",
-                            "breakdown": {{
-                                "accommodation": "Amount",
-                                "activities": "Amount",
-                                "transportation": "Amount",
-                                "food": "Amount",
-                                "miscellaneous": "Amount"
-                            }}
-                        }}
-                    }},
-                    "essential_information": {{
-                        "weather_forecast": "General weather info",
-                        "required_documents": ["Necessary documents", "Visas", "Passes"],
-                        "important_notes": ["Practical tips", "Local customs", "Essential apps"],
-                        "health_safety": ["Local emergency numbers", "List of facilities", "Location-specific advice"]
-                        "packing_recommendations": ["Weather-appropriate items", "Activity-specific gear"]
-                    }},
-                    "daily_itinerary": [
-                        {{
-                            "day": "Day number",
-                            "date": "Specific date",
-                            "weather_forecast": "Range in C/F Expected weather",
-                            "activities": [
-                                {{
-                                    "time": "Start time",
-                                    "activity": "Name of activity",
-                                    "duration": "Length in minutes/hours",
-                                    "location": {{
-                                        "name": "Place name",
-                                        "address": "Full address",
-                                        "coordinates": "GPS coordinates",
-                                        "map_link": "URL"
-                                    }},
-                                    "transport": {{
-                                        "mode": "Type of transport",
-                                        "duration": "Travel time",
-                                        "cost": "Amount",
-                                        "notes": "Special instructions"
-                                    }},
-                                    "booking_reference": "If applicable",
-                                    "budget": {{
-                                        "amount": "Cost in local currency and USD",
-                                        "included_items": ["What's covered"],
-                                        "additional_costs": ["Optional extras"]
-                                    }},
-                                    "tips": ["Relevant advice", "Best photo spots", "What to bring"]
-                                }}
-                            ],
-                            "daily_notes": ["Day-specific tips", "Timing considerations", "Backup plans"]
-                        }}
-                    ],
-                    "contingency_plans": {{
-                        "weather_alternatives": ["Indoor options"],
-                        "backup_activities": ["Secondary choices"],
-                        "flexible_timing": ["Adjustable components"]
-                    }}
-                }}
-            }}
-            
-            PLANNING RULES:
-            
-            1. Organization:
-            - Create logical day-by-day flow
-            - Balance activity levels
-            - Account for travel times between locations
-            - Include meal times and rest periods
-            - Ensure activities are properly spaced
-            
-            2. Time Management:
-            - Add 30-minute buffers between activities
-            - Consider check-in/check-out times
-            - Check venue operating hours
-            - Plan around sunrise/sunset times
-            - Account for peak tourist times
-            
-            3. Budget Tracking:
-            - Include all costs in local currency and USD
-            - Track running total against overall budget
-            - Note included vs additional costs
-            - Add booking references where applicable
-            
-            4. Practical Details:
-            - Check weather impact on activities
-            - Include all booking requirements
-            - Add transportation logistics
-            - Provide local tips and cultural notes
-            - Include emergency information
-            
-            5. Documentation:
-            - Start with clear summary
-            - List essential information first
-            - Create detailed daily schedules
-            - Include backup plans
-            - Add relevant maps and coordinates
-            
-            Remember to maintain a balance between activities and rest, consider local customs and timing, and ensure all practical details are included for each activity.
-            """),
+    async def planning(self) -> dict:
+        output = await self.planner_agent.task(
+            description=_PLANNING_PROMPT_TMPL.format(options=self.options, context=self.context),
             json_output=True
         )
 
         return output
 
-    def chat(self, answer: str, question: str, options: list = None):
+    async def _recommendation_for_context(self) -> dict:
+        """Returns the recommendation for the current context, reusing the last one if the context is unchanged."""
+        context = self.context
+        if self._recommendation is not None and self._recommendation_context == context:
+            return self._recommendation
+        recommendation = await self.recommendation()
+        self._recommendation, self._recommendation_context = recommendation, context
+        return recommendation
+
+    async def chat(self, answer: str, question: str, options: list = None):
         if options is not None:
             self.options += options
-        output = self.context_analyze(answer, question)
-        output["recommendation"] = self.recommendation()
-        try:
-            output["planning"] = self.planning()
-        except:
-            pass
+        output = await self.context_analyze(answer, question)
+        # Recommendation and planning only depend on the analyzed context, so run them concurrently.
+        recommendation, planning = await asyncio.gather(
+            self._recommendation_for_context(), self.planning(), return_exceptions=True
+        )
+        if isinstance(recommendation, BaseException):
+            raise recommendation
+        output["recommendation"] = recommendation
+        if isinstance(planning, BaseException):
+            print(f"Planning failed: {planning!r}")
+        else:
+            output["planning"] = planning
+            self.session["plan"] = planning
+
+        self.session["context"] = self.context
+        self.session["options"] = self.options
+        await asyncio.to_thread(self.session.update)
 
         return output
 
 
-session = Session()
-advisor = Advisor(session.session_id)
+async def main():
+    session = Session()
+    advisor = Advisor(session.session_id)
+
+    output = {
+        "following_question": "Hello"
+    }
+    while True:
+        output = await advisor.chat(input(output["following_question"] + "? "), output["following_question"])
+        print(output)
 
-output = {
-    "following_question": "Hello"
-}
-while True:
-    output = advisor.chat(input(output["following_question"] + "? "), output["following_question"])
-    print(output)
 
+if uvloop is not None:
+    uvloop.run(main())
+else:
+    asyncio.run(main())
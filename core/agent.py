@@ -1,5 +1,11 @@
-from groq import Groq, NOT_GIVEN
-import json
+from groq import AsyncGroq, NOT_GIVEN
+import asyncio
+import inspect
+
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
 
 
 class Agent:
@@ -9,21 +15,29 @@ class Agent:
             goal: str = None,
             backstory: str = None,
             tools: list = None,
-            model: str = 'llama3-groq-70b-8192-tool-use-preview'
+            model: str = 'llama3-groq-70b-8192-tool-use-preview',
+            max_retries: int = 2
     ):
-        self.client = Groq()
+        # The SDK retries rate-limit and connection errors itself, with backoff.
+        self.client = AsyncGroq(max_retries=max_retries)
         self.model = model
         self.role = role
         self.goal = goal
         self.backstory = backstory
-        self.tools = list(map(lambda t: t.copy(), tools)) if tools else []
+        # Schemas sent to the API and the callables they map to are kept apart,
+        # so the caller's tool dicts are never copied or mutated.
+        self.tool_schemas = [{k: v for k, v in t.items() if k != 'tool'} for t in tools or []]
+        self.available_functions = {t['function']['name']: t['tool'] for t in tools or []}
         self.messages = []
 
-        self.available_functions = {}
-        for tool in self.tools:
-            self.available_functions[tool['function']['name']] = tool.pop('tool')
+        # Role, goal and backstory never change, so the system message is built once
+        # and every task starts from the same prefix.
+        self._system_message = {
+            "role": "system",
+            "content": self._build_system_prompt()
+        }
 
-    def create_system_prompt(self):
+    def _build_system_prompt(self):
         """Generate a system prompt based on agent's role, goal, and backstory"""
         system_prompt = f"You are an AI agent with the role of {self.role}.\n"
         if self.goal:
@@ -31,26 +45,20 @@ class Agent:
         if self.backstory:
             system_prompt += f"Here is some context about you: {self.backstory}\n"
         system_prompt += "Use the tools provided to assist the user with tasks and provide helpful responses."
+        return system_prompt
 
-        self.messages = [{
-            "role": "system",
-            "content": system_prompt
-        }]
-
-    def task(self, description: str, json_output: bool = False):
+    async def task(self, description: str, json_output: bool = False):
         """Run a conversation with the user, allowing the agent to use tools as needed"""
-        self.create_system_prompt()
-
-        self.messages.append({
+        self.messages = [self._system_message, {
             "role": "user",
             "content": description + ("\n\nPlease return JSON." if json_output else ""),
-        })
+        }]
 
-        response = self.client.chat.completions.create(
+        response = await self.client.chat.completions.create(
             model=self.model,
             messages=self.messages,
             stream=False,
-            tools=self.tools,
+            tools=self.tool_schemas,
             tool_choice="auto",
             max_tokens=4096,
             response_format={"type": "json_object"} if False else NOT_GIVEN
@@ -59,14 +67,20 @@ class Agent:
         response_message = response.choices[0].message
         tool_calls = response_message.tool_calls
 
-        if tool_calls:
+        if not tool_calls:
+            response = response_message.content
+        else:
+            self.messages.append(response_message)
             for tool_call in tool_calls:
                 function_name = tool_call.function.name
                 function_to_call = self.available_functions.get(function_name)
-                function_args = json.loads(tool_call.function.arguments)
+                function_args = _json_loads(tool_call.function.arguments)
 
                 if function_to_call:
-                    function_response = function_to_call(**function_args)
+                    if inspect.iscoroutinefunction(function_to_call):
+                        function_response = await function_to_call(**function_args)
+                    else:
+                        function_response = await asyncio.to_thread(function_to_call, **function_args)
 
                     self.messages.append({
                         "tool_call_id": tool_call.id,
@@ -74,13 +88,13 @@ class Agent:
                         "content": function_response,
                     })
 
-        second_response = self.client.chat.completions.create(
-            model=self.model,
-            messages=self.messages,
-        )
-        response = second_response.choices[0].message.content
+            second_response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=self.messages,
+            )
+            response = second_response.choices[0].message.content
 
         if json_output:
-            response = json.loads(response)
+            response = _json_loads(response)
 
         return response
@@ -1,7 +1,66 @@
-import requests
+import ssl
+import time
+from collections import OrderedDict
 
+import certifi
+import httpx
 
-def map_search_api(term: str, lat: str, lng: str) -> str:
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
+_SSL_CONTEXT = ssl.create_default_context(cafile=certifi.where())
+
+# Shared client so tool calls reuse keep-alive connections; with HTTP/2 they are
+# multiplexed over a single TCP/TLS connection.
+_ACLIENT = httpx.AsyncClient(
+    transport=httpx.AsyncHTTPTransport(
+        verify=_SSL_CONTEXT,
+        http2=_HTTP2,
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        retries=3,
+    ),
+    timeout=httpx.Timeout(30.0, connect=3.05),
+)
+
+_CACHE = OrderedDict()  # key -> (expires_at, response text)
+_CACHE_MAX = 512
+_CACHE_TTL = 900
+
+
+def _cache_get(key):
+    entry = _CACHE.get(key)
+    if entry is None:
+        return None
+    if entry[0] < time.monotonic():
+        del _CACHE[key]
+        return None
+    _CACHE.move_to_end(key)
+    return entry[1]
+
+
+def _cache_set(key, value):
+    _CACHE[key] = (time.monotonic() + _CACHE_TTL, value)
+    _CACHE.move_to_end(key)
+    if len(_CACHE) > _CACHE_MAX:
+        _CACHE.popitem(last=False)
+
+
+def _round_coord(value):
+    """Rounds a coordinate to 4 decimals (~11 m) so nearby searches share a cache entry."""
+    try:
+        return round(float(value), 4)
+    except (TypeError, ValueError):
+        return value
+
+
+async def map_search_api(term: str, lat: str, lng: str) -> str:
+    key = ('map', term, _round_coord(lat), _round_coord(lng))
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
 
     url = "https://app.radeai.com/tools/neshan/search/"
 
@@ -11,25 +70,29 @@ def map_search_api(term: str, lat: str, lng: str) -> str:
         'lng': lng
     }
 
-    files = []
-    headers = {}
-
-    response = requests.request("POST", url, headers=headers, data=payload, files=files, verify=False)
+    response = await _ACLIENT.post(url, data=payload)
+    if response.is_success:
+        _cache_set(key, response.text)
 
     return response.text
 
 
-def google_search_api(query: str, include_content: bool = True) -> str:
+async def google_search_api(query: str, include_content: bool = True) -> str:
+    key = ('google', query, include_content)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+
     url = "https://app.radeai.com/tools/google/search/"
 
     payload = {
         'query': query,
-        'include_content': include_content,
+        # httpx would send booleans as "true"/"false"; keep the "True"/"False" form the API has been getting.
+        'include_content': str(include_content),
     }
 
-    files = []
-    headers = {}
-
-    response = requests.request("POST", url, headers=headers, data=payload, files=files, verify=False)
+    response = await _ACLIENT.post(url, data=payload)
+    if response.is_success:
+        _cache_set(key, response.text)
 
     return response.text
@@ -1,3 +1,4 @@
+import asyncio
 import json
 
 from core.agent import Agent
@@ -66,10 +67,15 @@ agent = Agent(
     tools=tools  # Pass the tools directly here
 )
 
-# Example prompt for calculating
-user_prompt = "What is 25 * 4 + 10?"
-print(agent.task(user_prompt))
 
-# Example prompt for weather info
-user_prompt = "What's the weather in Paris?"
-print(agent.task(user_prompt))
+async def main():
+    # Example prompt for calculating
+    user_prompt = "What is 25 * 4 + 10?"
+    print(await agent.task(user_prompt))
+
+    # Example prompt for weather info
+    user_prompt = "What's the weather in Paris?"
+    print(await agent.task(user_prompt))
+
+
+asyncio.run(main())